@@ -0,0 +1,77 @@
+"""Fail if building the app gets slower to import than the budget.
+
+Usage (from momentum-tracker-backend/):
+
+    python scripts/check_import_time.py [--budget-ms 1000]
+
+Runs ``python -X importtime`` on ``import src.main; src.main.app`` in a fresh
+interpreter and counts only the imports that triggers, i.e. not the modules a
+bare interpreter already loads at startup. Exits non-zero if that total is
+over budget or if a module that should load lazily (fpdf, PIL, fontTools)
+shows up.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed by PDF generation; must not be imported at startup.
+LAZY_MODULES = ('fpdf', 'PIL', 'fontTools')
+
+
+STARTUP_CODE = 'import src.main; src.main.app'
+
+
+def measure(code=STARTUP_CODE):
+    """Return a list of (cumulative_us, self_us, module_name) for running code."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f'Running {code!r} failed')
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Drop the separator space; what remains is two spaces per nesting level.
+        rows.append((int(cumulative_us), int(self_us), name[1:].rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=1000)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    startup = {r[2] for r in measure('pass')}
+    rows = [r for r in measure() if r[2] not in startup]
+    top_level = [r for r in rows if not r[2].startswith(' ')]
+    total_ms = sum(r[0] for r in top_level) / 1000
+
+    print(f'Import time for {STARTUP_CODE!r}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)')
+    for cumulative_us, _, name in sorted(rows, reverse=True)[:args.top]:
+        print(f'  {cumulative_us / 1000:8.1f} ms  {name.strip()}')
+
+    failed = False
+    eager = sorted({r[2].strip().split('.')[0] for r in rows} & set(LAZY_MODULES))
+    if eager:
+        print(f'FAIL: lazily-loaded modules imported at startup: {", ".join(eager)}')
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f'FAIL: over budget by {total_ms - args.budget_ms:.1f} ms')
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,48 +1,222 @@
 import os
 import sys
+import time
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import click
 from flask import Flask, send_from_directory
 from flask_cors import CORS
+from sqlalchemy.engine import make_url
+from sqlalchemy.schema import CreateColumn
 from src.models.behavioral_data import db
-from src.routes.user import user_bp
-from src.routes.behavioral_data import behavioral_bp
-from src.routes.reports import reports_bp
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 
-# Enable CORS for all routes
-CORS(app, origins="*")
+def pending_schema_changes():
+    """Tables and columns the models define but the database lacks. Needs an app context."""
+    inspector = db.inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    pending = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            pending.append(table.name)
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        pending.extend(f'{table.name}.{column.name}' for column in table.columns
+                       if column.name not in existing)
+    return pending
 
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(behavioral_bp, url_prefix='/api')
-app.register_blueprint(reports_bp, url_prefix='/api')
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-with app.app_context():
+def upgrade_schema():
+    """Create missing tables, columns and indexes. Needs an app context.
+
+    Returns the added columns as 'table.column' strings.
+    """
+    added = []
     db.create_all()
+    # create_all() skips tables that already exist, so columns and
+    # indexes added to existing models have to be created separately.
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                    conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+                    added.append(f'{table.name}.{column.name}')
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+    # WAL lets online backups read a consistent snapshot while requests
+    # keep writing. The setting is stored in the database file.
+    with db.engine.connect() as conn:
+        conn.execute(db.text('PRAGMA journal_mode=WAL'))
+    return added
+
+
+def create_app(config=None):
+    """Build the Flask app.
+
+    ``config`` overrides the defaults below (e.g. a different
+    SQLALCHEMY_DATABASE_URI). Nothing here touches the database file; run
+    ``flask --app src.main migrate`` to create the schema before first start.
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+
+    # Enable CORS for all routes
+    CORS(app, origins="*")
+
+    # Blueprints are imported here rather than at module level so that importing
+    # src.main alone (see __getattr__ below) stays cheap.
+    from src.routes.user import user_bp
+    from src.routes.behavioral_data import behavioral_bp
+    from src.routes.reports import reports_bp
+
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(behavioral_bp, url_prefix='/api')
+    app.register_blueprint(reports_bp, url_prefix='/api')
+
+    # Database configuration
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Backups: seconds between scheduled snapshots (0 disables) and how many to keep
+    app.config['BACKUP_DIR'] = os.path.join(os.path.dirname(__file__), 'database', 'backups')
+    app.config['BACKUP_INTERVAL'] = int(os.environ.get('MOMENTUM_BACKUP_INTERVAL', 0))
+    app.config['BACKUP_RETENTION'] = int(os.environ.get('MOMENTUM_BACKUP_RETENTION', 14))
+
+    if config:
+        app.config.update(config)
+    db.init_app(app)
+
+    db_path = make_url(app.config['SQLALCHEMY_DATABASE_URI']).database
+
+    @app.cli.command('migrate')
+    def migrate():
+        """Create any missing database tables, columns and indexes."""
+        for column in upgrade_schema():
+            click.echo(f'Added column {column}')
+        click.echo('Database schema is up to date.')
+
+    @app.cli.command('backup')
+    @click.option('--list', 'list_only', is_flag=True, help='List existing snapshots instead.')
+    def backup(list_only):
+        """Take an online snapshot of the database and apply retention."""
+        from src.utils.backup import create_snapshot, list_snapshots, prune_snapshots
+
+        backup_dir = app.config['BACKUP_DIR']
+        if list_only:
+            for path in list_snapshots(backup_dir):
+                click.echo(f'{path}  {os.path.getsize(path)} bytes')
+            return
+
+        info = create_snapshot(db_path, backup_dir)
+        click.echo(f"Wrote {info['path']} ({info['bytes']} bytes) in {info['seconds']:.2f}s "
+                   f"({info['mbPerSecond']} MB/s, {info['restarts']} restarts)")
+        for path in prune_snapshots(backup_dir, app.config['BACKUP_RETENTION']):
+            click.echo(f'Removed old snapshot {path}')
+
+    @app.cli.command('restore')
+    @click.argument('snapshot', type=click.Path(exists=True, dir_okay=False))
+    @click.confirmation_option(prompt='Replace the live database with this snapshot?')
+    def restore(snapshot):
+        """Restore the database from a snapshot file."""
+        from src.utils.backup import PRE_RESTORE_PREFIX, create_snapshot, restore_snapshot
+
+        safety = create_snapshot(db_path, app.config['BACKUP_DIR'], prefix=PRE_RESTORE_PREFIX)
+        click.echo(f"Saved current database to {safety['path']}")
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+        started = time.perf_counter()
+        restore_snapshot(snapshot, db_path)
+        db.engine.dispose()
+        click.echo(f'Restored {snapshot} in {time.perf_counter() - started:.2f}s')
+
+    @app.cli.command('import-students')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+                  help='Defaults to csv for .csv files, jsonl otherwise.')
+    @click.option('--batch-size', default=1000, show_default=True)
+    def import_students(path, fmt, batch_size):
+        """Upsert students from a CSV or JSON-lines roster file."""
+        from src.utils.roster_import import import_students as run_import
+
+        fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        started = time.perf_counter()
+
+        def progress(summary):
+            click.echo(f"{summary['processed']} rows processed "
+                       f"({summary['inserted']} inserted, {summary['updated']} updated, "
+                       f"{summary['failed']} failed)")
+
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            summary = run_import(f, fmt, batch_size=batch_size, progress=progress)
+
+        for error in summary['errors']:
+            click.echo(f"line {error['line']}: {error['error']}", err=True)
+        if summary['failed'] > len(summary['errors']):
+            click.echo(f"... and {summary['failed'] - len(summary['errors'])} more errors", err=True)
+        click.echo(f'Done in {time.perf_counter() - started:.1f}s')
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = app.static_folder
+        if static_folder_path is None:
+                return "Static folder not configured", 404
+
+        if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
+            return send_from_directory(static_folder_path, path)
         else:
-            return "index.html not found", 404
+            index_path = os.path.join(static_folder_path, 'index.html')
+            if os.path.exists(index_path):
+                return send_from_directory(static_folder_path, 'index.html')
+            else:
+                return "index.html not found", 404
+
+    return app
+
+
+def start_backup_scheduler(app):
+    """Start scheduled snapshots if BACKUP_INTERVAL is set.
+
+    Only call this from a process that serves requests (wsgi.py, the dev
+    server), not from CLI commands. Calling it again is a no-op.
+    """
+    if app.config['BACKUP_INTERVAL'] <= 0 or 'backup_scheduler' in app.extensions:
+        return
+    from src.utils.backup import BackupScheduler
+
+    app.extensions['backup_scheduler'] = BackupScheduler(
+        app, make_url(app.config['SQLALCHEMY_DATABASE_URI']).database, app.config['BACKUP_DIR'],
+        app.config['BACKUP_INTERVAL'], app.config['BACKUP_RETENTION']
+    )
+    app.extensions['backup_scheduler'].start()
+
+
+_app = None
+
+
+def __getattr__(name):
+    # `src.main:app` (flask --app, gunicorn) is built on first access rather
+    # than at import time.
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 if __name__ == '__main__':
+    app = create_app()
+    # The dev server keeps its old convenience of upgrading the schema on start.
+    with app.app_context():
+        for column in upgrade_schema():
+            click.echo(f'Added column {column}')
+    # With the debug reloader only the child process (WERKZEUG_RUN_MAIN set)
+    # serves requests; the watching parent should not take backups.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_backup_scheduler(app)
     app.run(host='0.0.0.0', port=5000, debug=True)
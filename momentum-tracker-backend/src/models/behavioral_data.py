@@ -6,8 +6,13 @@ db = SQLAlchemy()
 
 class Student(db.Model):
     __tablename__ = 'students'
+    __table_args__ = (
+        # Upsert key for roster imports
+        db.Index('ix_students_campus_external', 'campus_id', 'external_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
+    external_id = db.Column(db.String(100))  # district/SIS student id
     first_name = db.Column(db.String(100), nullable=False)
     last_name = db.Column(db.String(100), nullable=False)
     grade = db.Column(db.String(20))
@@ -24,6 +29,7 @@ class Student(db.Model):
     def to_dict(self):
         return {
             'id': self.id,
+            'externalId': self.external_id,
             'firstName': self.first_name,
             'lastName': self.last_name,
             'grade': self.grade,
@@ -37,6 +43,10 @@ class Student(db.Model):
 
 class BehaviorLog(db.Model):
     __tablename__ = 'behavior_logs'
+    __table_args__ = (
+        # Covers the per-session GROUP BY in /api/sessions
+        db.Index('ix_behavior_logs_student_session', 'student_id', 'session_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
@@ -1,10 +1,31 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from src.models.behavioral_data import db, Student, BehaviorLog, Settings, User
+from sqlalchemy import func
 from datetime import datetime, timedelta
+import io
 import json
+import math
+import threading
+import time
 
 behavioral_bp = Blueprint('behavioral', __name__)
 
+# Recently computed /sessions responses, keyed on the query string. Cleared
+# whenever a behavior log or the settings change; the TTL bounds staleness
+# when another worker process did the write.
+SESSION_CACHE_TTL = 60  # seconds
+SESSION_CACHE_SIZE = 128
+SESSION_CACHE_MAX_INTERVALS = 20000  # larger responses are not cached
+DEFAULT_INTERVAL_LENGTH = 10  # seconds
+MAX_TIMELINE_INTERVALS = 1000  # longer sessions report totals only
+MAX_SESSION_LIMIT = 500
+_session_cache = {}
+_session_cache_lock = threading.Lock()
+
+def _invalidate_session_cache():
+    with _session_cache_lock:
+        _session_cache.clear()
+
 # Student routes
 @behavioral_bp.route('/students', methods=['GET'])
 def get_students():
@@ -24,6 +45,7 @@ def create_student():
     data = request.get_json()
     
     student = Student(
+        external_id=data.get('externalId'),
         first_name=data.get('firstName'),
         last_name=data.get('lastName'),
         grade=data.get('grade'),
@@ -39,6 +61,29 @@ def create_student():
     
     return jsonify(student.to_dict()), 201
 
+@behavioral_bp.route('/students/import', methods=['POST'])
+def import_students():
+    """Bulk upsert students from a CSV or JSON-lines request body.
+
+    Rows are keyed on (campusId, externalId). The format comes from the
+    ?format= parameter (csv or jsonl) or the Content-Type (text/csv selects
+    CSV); the body is streamed, not buffered.
+    """
+    from src.utils.roster_import import import_students as run_import
+
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'jsonl')
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({'error': 'format must be csv or jsonl'}), 400
+
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+
+    def log_progress(summary):
+        current_app.logger.info('Student import: %d rows processed, %d failed',
+                                summary['processed'], summary['failed'])
+
+    summary = run_import(lines, fmt, progress=log_progress)
+    return jsonify(summary)
+
 @behavioral_bp.route('/students/<int:student_id>', methods=['GET'])
 def get_student(student_id):
     """Get a specific student"""
@@ -96,6 +141,7 @@ def create_behavior_log():
     
     db.session.add(behavior_log)
     db.session.commit()
+    _invalidate_session_cache()
     
     return jsonify(behavior_log.to_dict()), 201
 
@@ -119,6 +165,7 @@ def update_behavior_log(log_id):
             setattr(behavior_log, field, json.dumps(data[camel_case]))
     
     db.session.commit()
+    _invalidate_session_cache()
     return jsonify(behavior_log.to_dict())
 
 @behavioral_bp.route('/behavior-logs/<int:log_id>', methods=['DELETE'])
@@ -127,6 +174,7 @@ def delete_behavior_log(log_id):
     behavior_log = BehaviorLog.query.get_or_404(log_id)
     db.session.delete(behavior_log)
     db.session.commit()
+    _invalidate_session_cache()
     return '', 204
 
 # Analytics routes
@@ -189,6 +237,171 @@ def get_dashboard_analytics(student_id):
         'logs': [log.to_dict() for log in logs[-10:]]  # Last 10 logs
     })
 
+# Session routes
+def _interval_timeline(events, interval_length):
+    """Bucket (start_epoch, duration) events into fixed-length intervals.
+
+    A log occupies every interval its [start, start + duration] span touches,
+    which is how partial-interval recording is scored. Occupancy is
+    computed from merged ranges so cost does not grow with the session span;
+    the per-interval timeline is only included up to MAX_TIMELINE_INTERVALS.
+    """
+    session_start = min(start for start, _ in events)
+    # A zero-duration (frequency) log still marks the interval it falls in
+    session_end = max(start + max(duration, 1) for start, duration in events)
+    total = max(1, math.ceil((session_end - session_start) / interval_length))
+
+    ranges = []
+    for start, duration in events:
+        first = int((start - session_start) // interval_length)
+        last = first
+        if duration > 0:
+            last = min(total - 1, math.ceil((start + duration - session_start) / interval_length) - 1)
+        ranges.append((first, last))
+
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    occupied = sum(last - first + 1 for first, last in merged)
+
+    timeline = None
+    if total <= MAX_TIMELINE_INTERVALS:
+        timeline = [False] * total
+        for first, last in merged:
+            timeline[first:last + 1] = [True] * (last - first + 1)
+
+    return {
+        'length': interval_length,
+        'total': total,
+        'occupied': occupied,
+        'percentOccupied': round(100.0 * occupied / total, 1),
+        'timeline': timeline
+    }
+
+def _compute_sessions(args, interval_length):
+    """Aggregate behavior logs per observation session in one grouped query"""
+    started = func.min(BehaviorLog.timestamp)
+    # SQLite-specific: pack each log's epoch timestamp and duration so interval
+    # occupancy can be computed without loading the rows themselves.
+    events = func.group_concat(
+        func.printf('%s:%d', func.strftime('%s', BehaviorLog.timestamp), func.coalesce(BehaviorLog.duration, 0))
+    )
+    query = db.session.query(
+        BehaviorLog.session_id,
+        BehaviorLog.student_id,
+        func.count(BehaviorLog.id),
+        func.sum(func.coalesce(BehaviorLog.frequency, 0)),
+        func.sum(func.coalesce(BehaviorLog.duration, 0)),
+        func.avg(BehaviorLog.intensity),
+        started,
+        func.max(BehaviorLog.timestamp),
+        events
+    ).filter(BehaviorLog.session_id.isnot(None))
+
+    student_ids = args.get('studentIds') or args.get('studentId')
+    if student_ids:
+        query = query.filter(BehaviorLog.student_id.in_(
+            [int(sid) for sid in student_ids.split(',') if sid.strip()]
+        ))
+
+    campus_id = args.get('campusId')
+    if campus_id:
+        query = query.join(Student).filter(Student.campus_id == campus_id)
+
+    session_id = args.get('sessionId')
+    if session_id:
+        query = query.filter(BehaviorLog.session_id == session_id)
+
+    start_date = args.get('startDate')
+    if start_date:
+        start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+        query = query.filter(BehaviorLog.timestamp >= start_dt)
+
+    end_date = args.get('endDate')
+    if end_date:
+        end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+        query = query.filter(BehaviorLog.timestamp <= end_dt)
+
+    limit = min(max(args.get('limit', 50, type=int), 1), MAX_SESSION_LIMIT)
+    rows = query.group_by(BehaviorLog.student_id, BehaviorLog.session_id) \
+        .order_by(started.desc()).limit(limit).all()
+
+    sessions = []
+    for (session_id, student_id, log_count, total_frequency, total_duration,
+         avg_intensity, first_ts, last_ts, packed) in rows:
+        parsed = []
+        for item in packed.split(','):
+            saved, duration = item.split(':')
+            duration = max(int(duration), 0)
+            # timestamp is set server-side when the log is saved, after the
+            # timer stopped, so the behavior covered [timestamp - duration, timestamp]
+            parsed.append((int(saved) - duration, duration))
+        session_start = datetime.utcfromtimestamp(min(start for start, _ in parsed))
+
+        sessions.append({
+            'sessionId': session_id,
+            'studentId': student_id,
+            'start': session_start.isoformat(),
+            'lastLog': last_ts.isoformat(),
+            'logCount': log_count,
+            'totalFrequency': total_frequency,
+            'totalDuration': total_duration,
+            'averageIntensity': round(avg_intensity, 2) if avg_intensity is not None else None,
+            'intervals': _interval_timeline(parsed, interval_length)
+        })
+
+    return sessions
+
+def _settings_interval_length():
+    """Interval length from Settings.intervals, or the default if unset or invalid"""
+    settings = Settings.query.first()
+    intervals = settings.to_dict()['intervals'] if settings else {}
+    if not isinstance(intervals, dict):
+        return DEFAULT_INTERVAL_LENGTH
+    try:
+        interval_length = int(intervals.get('intervalLength') or DEFAULT_INTERVAL_LENGTH)
+    except (TypeError, ValueError):
+        return DEFAULT_INTERVAL_LENGTH
+    return interval_length if interval_length > 0 else DEFAULT_INTERVAL_LENGTH
+
+@behavioral_bp.route('/sessions', methods=['GET'])
+def get_sessions():
+    """Get per-session duration totals and interval occupancy.
+
+    Filters: studentIds (comma-separated) or studentId, campusId, sessionId,
+    startDate, endDate, limit (most recent sessions first, default 50, max 500).
+    intervalLength overrides the interval length from settings, in seconds.
+    """
+    cache_key = tuple(sorted(request.args.items()))
+    with _session_cache_lock:
+        cached = _session_cache.get(cache_key)
+    if cached and time.monotonic() - cached[0] < SESSION_CACHE_TTL:
+        return jsonify(cached[1])
+
+    interval_length = request.args.get('intervalLength', type=int)
+    if not interval_length:
+        interval_length = _settings_interval_length()
+    if interval_length <= 0:
+        return jsonify({'error': 'intervalLength must be positive'}), 400
+
+    try:
+        sessions = _compute_sessions(request.args, interval_length)
+    except ValueError:
+        return jsonify({'error': 'Invalid studentIds or date filter'}), 400
+
+    result = {'intervalLength': interval_length, 'sessions': sessions}
+    timeline_size = sum(len(session['intervals']['timeline'] or []) for session in sessions)
+    if timeline_size <= SESSION_CACHE_MAX_INTERVALS:
+        with _session_cache_lock:
+            if len(_session_cache) >= SESSION_CACHE_SIZE:
+                _session_cache.pop(next(iter(_session_cache)))
+            _session_cache[cache_key] = (time.monotonic(), result)
+
+    return jsonify(result)
+
 # Settings routes
 @behavioral_bp.route('/settings', methods=['GET'])
 def get_settings():
@@ -247,6 +460,7 @@ def update_settings():
     
     settings.updated_at = datetime.utcnow()
     db.session.commit()
+    _invalidate_session_cache()
     
     return jsonify(settings.to_dict())
 
@@ -0,0 +1,191 @@
+# Online snapshots of the SQLite database using sqlite3's backup API.
+#
+# Pages are copied in small steps with a pause in between so writers can
+# commit while a snapshot is running. SQLite restarts a stepped backup when
+# another connection writes to the source, so under a sustained write load we
+# fall back to one single-step copy, which in WAL mode only holds a read
+# snapshot and still does not block writers. Outside WAL mode that copy would
+# lock out writers for its whole duration, so it is refused instead.
+from datetime import datetime
+from pathlib import Path
+import glob
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: scheduler runs without the cross-process lock
+    fcntl = None
+
+PAGES_PER_STEP = 1024
+STEP_SLEEP = 0.05  # seconds
+MAX_RESTARTS = 5
+SNAPSHOT_PREFIX = 'app-'
+# Safety copies taken by restore; not listed or pruned with regular snapshots
+PRE_RESTORE_PREFIX = 'pre-restore-'
+SNAPSHOT_SUFFIX = '.db'
+LOCK_FILE = '.backup.lock'
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _connect(path, mode):
+    """Open an existing database; sqlite3.connect(path) would create a missing one"""
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f'Database file not found: {path}')
+    return sqlite3.connect(f'{Path(path).resolve().as_uri()}?mode={mode}', uri=True)
+
+
+def _copy(source, dest, allow_single_step):
+    """Copy source into dest, returning the number of restarts seen"""
+    state = {'remaining': None, 'restarts': 0}
+
+    def progress(status, remaining, total):
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state['remaining'] = remaining
+
+    try:
+        source.backup(dest, pages=PAGES_PER_STEP, progress=progress, sleep=STEP_SLEEP)
+    except _TooManyRestarts:
+        if not allow_single_step:
+            raise RuntimeError('Backup kept restarting under write load and the database '
+                               'is not in WAL mode; run `flask migrate` to enable WAL')
+        source.backup(dest, pages=-1)
+    return state['restarts']
+
+
+def create_snapshot(db_path, backup_dir, prefix=SNAPSHOT_PREFIX):
+    """Write a consistent copy of db_path into backup_dir.
+
+    The copy is written to a uniquely named temporary file and renamed into
+    place, so a snapshot file either is complete or does not exist. Returns a
+    dict with the path, size and timing.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    name = f"{prefix}{datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')}{SNAPSHOT_SUFFIX}"
+    path = os.path.join(backup_dir, name)
+    fd, tmp_path = tempfile.mkstemp(dir=backup_dir, prefix=name, suffix='.tmp')
+    os.close(fd)
+
+    started = time.perf_counter()
+    try:
+        source = _connect(db_path, 'rw')
+        dest = sqlite3.connect(tmp_path)
+        try:
+            wal = source.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal'
+            restarts = _copy(source, dest, allow_single_step=wal)
+            # Make the snapshot a self-contained file rather than a WAL database
+            dest.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            dest.close()
+            source.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    seconds = time.perf_counter() - started
+
+    size = os.path.getsize(path)
+    return {
+        'path': path,
+        'bytes': size,
+        'seconds': round(seconds, 3),
+        'mbPerSecond': round(size / 1024 / 1024 / seconds, 1) if seconds else None,
+        'restarts': restarts
+    }
+
+
+def list_snapshots(backup_dir):
+    """Snapshot paths in backup_dir, newest first"""
+    pattern = os.path.join(backup_dir, f'{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}')
+    return sorted(glob.glob(pattern), reverse=True)
+
+
+def prune_snapshots(backup_dir, keep):
+    """Delete all but the newest `keep` snapshots and return the removed paths"""
+    removed = list_snapshots(backup_dir)[keep:]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def restore_snapshot(snapshot_path, db_path):
+    """Copy a snapshot back over the live database.
+
+    The snapshot is integrity-checked first. The copy goes through the backup
+    API into the live file, so other connections see either the old or the
+    restored database, never a mix.
+    """
+    if os.path.realpath(snapshot_path) == os.path.realpath(db_path):
+        raise ValueError('Snapshot is the live database file')
+    source = _connect(snapshot_path, 'ro')
+    try:
+        result = source.execute('PRAGMA integrity_check').fetchone()[0]
+        if result != 'ok':
+            raise ValueError(f'Snapshot failed integrity check: {result}')
+        dest = _connect(db_path, 'rw')
+        try:
+            source.backup(dest)
+        finally:
+            dest.close()
+    finally:
+        source.close()
+
+
+class BackupScheduler(threading.Thread):
+    """Daemon thread that snapshots the database every `interval` seconds.
+
+    Every worker process may run one of these. An exclusive lock file in
+    backup_dir serialises the check-and-snapshot across processes, and a
+    snapshot is skipped when another process wrote one within the last half
+    interval.
+    """
+
+    def __init__(self, app, db_path, backup_dir, interval, keep):
+        super().__init__(name='momentum-backup', daemon=True)
+        self.app = app
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.interval = interval
+        self.keep = keep
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                self.app.logger.exception('Scheduled database backup failed')
+
+    def run_once(self):
+        os.makedirs(self.backup_dir, exist_ok=True)
+        with open(os.path.join(self.backup_dir, LOCK_FILE), 'a') as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return None  # another process is taking this snapshot
+            return self._snapshot_if_due()
+
+    def _snapshot_if_due(self):
+        snapshots = list_snapshots(self.backup_dir)
+        if snapshots and time.time() - os.path.getmtime(snapshots[0]) < self.interval / 2:
+            return None
+
+        info = create_snapshot(self.db_path, self.backup_dir)
+        self.app.logger.info('Database backup %s: %d bytes in %.2fs (%d restarts)',
+                             info['path'], info['bytes'], info['seconds'], info['restarts'])
+        prune_snapshots(self.backup_dir, self.keep)
+        return info
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,41 @@
+# Kept out of src.routes.reports so fpdf (and the Pillow/fontTools stack it
+# pulls in) is only imported when a PDF is actually generated.
+from fpdf import FPDF
+
+class PDF(FPDF):
+    def header(self):
+        self.set_font("Arial", "B", 15)
+        self.cell(0, 10, "Momentum Tracker - Behavioral Report", 0, 1, "C")
+        self.ln(10)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font("Arial", "I", 8)
+        self.cell(0, 10, f"Page {self.page_no()}/{{nb}}", 0, 0, "C")
+
+    def chapter_title(self, title):
+        self.set_font("Arial", "B", 14)
+        self.cell(0, 10, title, 0, 1, "L")
+        self.ln(5)
+
+    def section_title(self, title):
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 8, title, 0, 1, "L")
+        self.ln(3)
+
+    def chapter_body(self, body):
+        self.set_font("Arial", "", 10)
+        self.multi_cell(0, 5, body)
+        self.ln()
+
+    def add_table_row(self, data, is_header=False):
+        if is_header:
+            self.set_font("Arial", "B", 9)
+        else:
+            self.set_font("Arial", "", 9)
+        
+        col_widths = [30, 40, 30, 30, 30, 30]  # Adjust column widths as needed
+        for i, item in enumerate(data):
+            if i < len(col_widths):
+                self.cell(col_widths[i], 6, str(item)[:15], 1, 0, "C")
+        self.ln()
@@ -0,0 +1,214 @@
+# Bulk student roster import, shared by POST /api/students/import and the
+# `flask import-students` command. Rows are read lazily from any iterable of
+# text lines and upserted on (campus_id, external_id) in batched
+# transactions, so memory stays bounded by the batch size.
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime
+from src.models.behavioral_data import db, Student
+import csv
+import json
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+# Always written from the roster file
+ROSTER_FIELDS = ['first_name', 'last_name']
+# Only overwritten on update when the row provides them (non-empty); rows
+# that omit them get the same defaults as POST /api/students on insert
+JSON_FIELDS = {
+    'target_behaviors': 'targetBehaviors',
+    'assigned_staff': 'assignedStaff',
+    'parent_ids': 'parentIds'
+}
+
+
+def read_rows(lines, fmt):
+    """Yield (line_number, record, error) for each row of a CSV or JSON-lines file.
+
+    CSV list columns (targetBehaviors, assignedStaff, parentIds) are
+    semicolon-separated.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            for key in JSON_FIELDS.values():
+                if record.get(key):
+                    record[key] = [item.strip() for item in record[key].split(';') if item.strip()]
+                else:
+                    record.pop(key, None)
+            yield reader.line_num, record, None
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f'Invalid JSON: {e}'
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, 'Expected a JSON object'
+                continue
+            yield line_number, record, None
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+
+def _parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+
+def _text(record, key, allow_number=False):
+    """Stripped string value of record[key], '' if absent, or raise ValueError"""
+    value = record.get(key)
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value.strip()
+    # JSON-lines ids and grades are often numbers; names never are
+    if allow_number and isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError(f'{key} must be a string')
+
+
+def _to_row(record):
+    """Convert a camelCase record into a students row, or raise ValueError.
+
+    Returns (row, provided) where provided is the frozenset of optional
+    columns the record actually set.
+    """
+    row = {
+        'external_id': _text(record, 'externalId', allow_number=True),
+        'campus_id': _text(record, 'campusId', allow_number=True),
+        'first_name': _text(record, 'firstName'),
+        'last_name': _text(record, 'lastName'),
+        'grade': _text(record, 'grade', allow_number=True) or None,
+        'iep_status': False,
+        'created_at': datetime.utcnow()
+    }
+    provided = set()
+    if row['grade'] is not None:
+        provided.add('grade')
+    iep_status = record.get('iepStatus')
+    if iep_status is not None and iep_status != '':
+        row['iep_status'] = _parse_bool(iep_status)
+        provided.add('iep_status')
+    missing = [key for key, column in [('externalId', 'external_id'), ('campusId', 'campus_id'),
+                                        ('firstName', 'first_name'), ('lastName', 'last_name')]
+               if not row[column]]
+    if missing:
+        raise ValueError(f'Missing required field(s): {", ".join(missing)}')
+
+    for column, key in JSON_FIELDS.items():
+        value = record.get(key)
+        if value is None:
+            row[column] = json.dumps([])
+        elif isinstance(value, list):
+            row[column] = json.dumps(value)
+            provided.add(column)
+        else:
+            raise ValueError(f'{key} must be a list')
+    return row, frozenset(provided)
+
+
+def _upsert_statement(provided):
+    """Upsert that only overwrites the roster fields plus the provided optional columns"""
+    stmt = sqlite_insert(Student.__table__)
+    update = {column: stmt.excluded[column] for column in ROSTER_FIELDS + sorted(provided)}
+    return stmt.on_conflict_do_update(index_elements=['campus_id', 'external_id'], set_=update)
+
+
+def _write_batch(batch, summary):
+    """Upsert one batch in a single transaction, falling back to row by row on failure"""
+    keys = [(row['campus_id'], row['external_id']) for _, row, _ in batch]
+    existing = set(db.session.query(Student.campus_id, Student.external_id)
+                   .filter(tuple_(Student.campus_id, Student.external_id).in_(keys)).all())
+
+    # One statement per set of provided columns; a typical file has just one.
+    # Input order is kept within each group.
+    groups = {}
+    for line_number, row, provided in batch:
+        groups.setdefault(provided, []).append((line_number, row))
+
+    try:
+        for provided, rows in groups.items():
+            db.session.execute(_upsert_statement(provided), [row for _, row in rows])
+        db.session.commit()
+        written = [(line_number, row) for line_number, row, _ in batch]
+    except SQLAlchemyError:
+        db.session.rollback()
+        written = []
+        for line_number, row, provided in batch:
+            try:
+                db.session.execute(_upsert_statement(provided), [row])
+                db.session.commit()
+                written.append((line_number, row))
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                _record_error(summary, line_number, str(e.orig if hasattr(e, 'orig') else e))
+
+    for _, row in written:
+        key = (row['campus_id'], row['external_id'])
+        if key in existing:
+            summary['updated'] += 1
+        else:
+            summary['inserted'] += 1
+            existing.add(key)
+
+
+def _record_error(summary, line_number, message):
+    summary['failed'] += 1
+    if len(summary['errors']) < MAX_REPORTED_ERRORS:
+        summary['errors'].append({'line': line_number, 'error': message})
+
+
+def import_students(lines, fmt, batch_size=BATCH_SIZE, progress=None):
+    """Upsert students from an iterable of CSV or JSON-lines text.
+
+    Bad rows are reported in the returned summary and skipped; they never
+    abort the rest of the import. Input that cannot be read at all (invalid
+    UTF-8, malformed CSV quoting) stops reading; rows before it are still
+    written and the summary carries an error entry with line None.
+    ``progress`` is called with the running summary after each committed batch.
+    """
+    summary = {'processed': 0, 'inserted': 0, 'updated': 0, 'failed': 0, 'errors': []}
+    batch = []
+    last_line = 0
+
+    rows = read_rows(lines, fmt)
+    while True:
+        try:
+            line_number, record, error = next(rows)
+        except StopIteration:
+            break
+        except (UnicodeDecodeError, csv.Error) as e:
+            _record_error(summary, None, f'Stopped reading input after line {last_line}: {e}')
+            break
+
+        last_line = line_number
+        summary['processed'] += 1
+        if error is None:
+            try:
+                row, provided = _to_row(record)
+                batch.append((line_number, row, provided))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            _record_error(summary, line_number, error)
+
+        if len(batch) >= batch_size:
+            _write_batch(batch, summary)
+            batch = []
+            if progress:
+                progress(summary)
+
+    if batch:
+        _write_batch(batch, summary)
+        if progress:
+            progress(summary)
+
+    return summary
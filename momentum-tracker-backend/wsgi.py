@@ -0,0 +1,17 @@
+# Production entry point, e.g. `gunicorn wsgi:app` from momentum-tracker-backend/.
+# Unlike `src.main:app` (also used by the flask CLI), this refuses to start on
+# an out-of-date schema and starts the backup scheduler when
+# MOMENTUM_BACKUP_INTERVAL is set.
+from src.main import create_app, pending_schema_changes, start_backup_scheduler
+
+app = create_app()
+
+# Workers don't migrate themselves: several of them racing on ALTER TABLE
+# would fail, so the upgrade stays an explicit deploy step.
+with app.app_context():
+    pending = pending_schema_changes()
+if pending:
+    raise SystemExit(f"Database schema is out of date (missing: {', '.join(pending)}). "
+                     "Run `flask --app src.main migrate` first.")
+
+start_backup_scheduler(app)